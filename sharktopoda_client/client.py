@@ -2,6 +2,7 @@
 Sharktopoda 2 client.
 """
 
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional
 from uuid import UUID
@@ -13,6 +14,14 @@ from sharktopoda_client.log import LogMixin
 from sharktopoda_client.udp import Timeout, UDPClient, UDPServer
 
 
+@lru_cache(maxsize=4096)
+def _uuid_str(uuid: UUID) -> str:
+    """
+    Format a UUID as its canonical string. Cached, as the same video and localization UUIDs are sent repeatedly.
+    """
+    return str(uuid)
+
+
 class SharktopodaClient(LogMixin):
     """
     Sharktopoda 2 client.
@@ -30,14 +39,26 @@ class SharktopodaClient(LogMixin):
             timeout: The timeout for UDP client requests.
         """
         self._udp_client = UDPClient(send_host, send_port, timeout=timeout)
-
-        self._udp_server = UDPServer(receive_port, self._handler)
-        assert self._udp_server.socket is not None  # force socket creation, may raise exception
-        self._udp_server.start()
         
         self._localization_controller = localization_controller or NoOpLocalizationController()
         
         self._open_callbacks = {}
+        
+        # Command dispatch table, built once and shared by every incoming datagram
+        self._command_handlers = {
+            "ping": self._on_ping,
+            "open done": self._on_open_done,
+            "frame capture done": self._on_frame_capture_done,
+            "add localizations": self._on_add_update_localizations,
+            "update localizations": self._on_add_update_localizations,
+            "remove localizations": self._on_remove_localizations,
+            "clear localizations": self._on_clear_localizations,
+            "select localizations": self._on_select_localizations,
+        }
+
+        self._udp_server = UDPServer(receive_port, self._handler)
+        assert self._udp_server.socket is not None  # force socket creation, may raise exception
+        self._udp_server.start()
 
     def _handler(self, data: dict, addr: tuple) -> Optional[dict]:
         """
@@ -47,69 +68,104 @@ class SharktopodaClient(LogMixin):
             data: The UDP packet data.
             addr: The address of the sender.
         """
-        self.logger.debug(f"Received UDP datagram from {addr}: {data}")
+        self.logger.debug("Received UDP datagram from %s: %s", addr, data)
 
         command = data.get("command", None)
+        handler = self._command_handlers.get(command, None)
+        if handler is None:
+            self.logger.warning("Unknown command: %s", command)
+            return None
 
-        def ok() -> dict:
-            return {"response": command, "status": "ok"}
-
-        if command == "ping":
-            return ok()
-
-        elif command == "open done":
-            status = data.get("status", None)
-            if status == "ok":
-                # Opened a video
-                uuid = UUID(data["uuid"])
-                self.logger.info(f"Open video success: {uuid}")
-                
-                # Call the open callback and remove it
-                if uuid in self._open_callbacks:
-                    self._open_callbacks[uuid]()
-                    del self._open_callbacks[uuid]
-            elif status == "failed":
-                # Failed to open a video
-                cause = data.get("cause", None)
-                self.logger.error(f"Failed to open video: {cause}")
-
-        elif command == "frame capture done":
-            status = data.get("status", None)
-            if status == "ok":
-                # Captured frame
-                frame_capture = FrameCapture.decode(data)
-                self.logger.info(f"Captured frame: {frame_capture}")
-            elif status == "failed":
-                # Failed to capture frame
-                cause = data.get("cause", None)
-                self.logger.error(f"Failed to capture frame: {cause}")
-        
-        elif command == "add localizations" or command == "update localizations":
-            uuid = UUID(data["uuid"])
-            localizations = list(map(Localization.decode, data["localizations"]))
-            self.logger.info(f"Received {len(localizations)} localizations for video {uuid}")
-            self._localization_controller.add_update_localizations(uuid, localizations)
-            return ok()
-        
-        elif command == "remove localizations":
-            uuid = UUID(data["uuid"])
-            localization_uuids = list(map(UUID, data["localizations"]))
-            self.logger.info(f"Received {len(localization_uuids)} localization removals for video {uuid}")
-            self._localization_controller.remove_localizations(uuid, localization_uuids)
-            return ok()
-        
-        elif command == "clear localizations":
-            uuid = UUID(data["uuid"])
-            self.logger.info(f"Received localization clear for video {uuid}")
-            self._localization_controller.clear_collection(uuid)
-            return ok()
-        
-        elif command == "select localizations":
+        return handler(data)
+
+    @staticmethod
+    def _ok(command: str) -> dict:
+        """
+        Build an "ok" response to a command.
+        """
+        return {"response": command, "status": "ok"}
+
+    def _on_ping(self, data: dict) -> dict:
+        """
+        Handle a "ping" command.
+        """
+        return self._ok(data["command"])
+
+    def _on_open_done(self, data: dict) -> None:
+        """
+        Handle an "open done" command.
+        """
+        status = data.get("status", None)
+        if status == "ok":
+            # Opened a video
             uuid = UUID(data["uuid"])
-            localization_uuids = list(map(UUID, data["localizations"]))
-            self.logger.info(f"Received localization selection for video {uuid}")
-            self._localization_controller.select_localizations(uuid, localization_uuids)
-            return ok()
+            self.logger.info("Open video success: %s", uuid)
+            
+            # Remove the open callback and call it. Pop first, open() may drop it concurrently on a request timeout
+            callback = self._open_callbacks.pop(uuid, None)
+            if callback is not None:
+                callback()
+        elif status == "failed":
+            # Failed to open a video
+            cause = data.get("cause", None)
+            self.logger.error("Failed to open video: %s", cause)
+            
+            # Drop the open callback, it will never be called
+            if "uuid" in data:
+                self._open_callbacks.pop(UUID(data["uuid"]), None)
+
+    def _on_frame_capture_done(self, data: dict) -> None:
+        """
+        Handle a "frame capture done" command.
+        """
+        status = data.get("status", None)
+        if status == "ok":
+            # Captured frame
+            frame_capture = FrameCapture.decode(data)
+            self.logger.info("Captured frame: %s", frame_capture)
+        elif status == "failed":
+            # Failed to capture frame
+            cause = data.get("cause", None)
+            self.logger.error("Failed to capture frame: %s", cause)
+
+    def _on_add_update_localizations(self, data: dict) -> dict:
+        """
+        Handle an "add localizations" or "update localizations" command.
+        """
+        uuid = UUID(data["uuid"])
+        localizations = list(map(Localization.decode, data["localizations"]))
+        self.logger.info("Received %d localizations for video %s", len(localizations), uuid)
+        self._localization_controller.add_update_localizations(uuid, localizations)
+        return self._ok(data["command"])
+
+    def _on_remove_localizations(self, data: dict) -> dict:
+        """
+        Handle a "remove localizations" command.
+        """
+        uuid = UUID(data["uuid"])
+        localization_uuids = list(map(UUID, data["localizations"]))
+        self.logger.info("Received %d localization removals for video %s", len(localization_uuids), uuid)
+        self._localization_controller.remove_localizations(uuid, localization_uuids)
+        return self._ok(data["command"])
+
+    def _on_clear_localizations(self, data: dict) -> dict:
+        """
+        Handle a "clear localizations" command.
+        """
+        uuid = UUID(data["uuid"])
+        self.logger.info("Received localization clear for video %s", uuid)
+        self._localization_controller.clear_collection(uuid)
+        return self._ok(data["command"])
+
+    def _on_select_localizations(self, data: dict) -> dict:
+        """
+        Handle a "select localizations" command.
+        """
+        uuid = UUID(data["uuid"])
+        localization_uuids = list(map(UUID, data["localizations"]))
+        self.logger.info("Received localization selection for video %s", uuid)
+        self._localization_controller.select_localizations(uuid, localization_uuids)
+        return self._ok(data["command"])
 
     def _request(self, data: dict) -> Optional[dict]:
         try:
@@ -117,6 +173,32 @@ class SharktopodaClient(LogMixin):
         except Timeout:
             self.logger.error("Request to Sharktopoda 2 timed out")
             return None
+        except ConnectionRefusedError:
+            self.logger.error("Request to Sharktopoda 2 was refused, is it running?")
+            return None
+
+    def _request_ok(self, data: dict, action: str) -> Optional[dict]:
+        """
+        Issue a request and check the response status.
+
+        Args:
+            data: The request data.
+            action: What the request does, for the failure log message (e.g. "play video").
+
+        Returns:
+            The response data, or None if the request failed or timed out.
+        """
+        response = self._request(data)
+        if response is None:
+            return None
+
+        # Check the response status
+        if response["status"] != "ok":
+            cause = response.get("cause", None)
+            self.logger.error("Failed to %s: %s", action, cause)
+            return None
+
+        return response
 
     def connect(self) -> bool:
         """
@@ -127,14 +209,8 @@ class SharktopodaClient(LogMixin):
         """
         # Send the connect command and wait for the response
         connect_command = {"command": "connect", "port": self._udp_server.port}
-        connect_response = self._request(connect_command)
+        connect_response = self._request_ok(connect_command, "connect to Sharktopoda 2")
         if connect_response is None:
-            self.logger.error("Connection to Sharktopoda 2 timed out")
-            return False
-
-        # Check the response status
-        if connect_response["status"] != "ok":
-            self.logger.error("Failed to connect to Sharktopoda 2")
             return False
 
         self.logger.info("Connected to Sharktopoda 2")
@@ -152,20 +228,17 @@ class SharktopodaClient(LogMixin):
         Returns:
             True if the operation was successful, False otherwise.
         """
-        open_command = {"command": "open", "uuid": str(uuid), "url": url}
-        open_response = self._request(open_command)
-
-        # Check the response status
-        if open_response["status"] != "ok":
-            self.logger.error("Failed to initiate open video")
-            return False
-
-        self.logger.info(f"Initiated open video {uuid} at {url}")
-        
-        # Store the callback
+        # Store the callback before sending, "open done" may arrive before the response is processed
         if callback is not None:
             self._open_callbacks[uuid] = callback
         
+        open_command = {"command": "open", "uuid": _uuid_str(uuid), "url": url}
+        open_response = self._request_ok(open_command, "initiate open video")
+        if open_response is None:
+            self._open_callbacks.pop(uuid, None)
+            return False
+
+        self.logger.info("Initiated open video %s at %s", uuid, url)
         return True
 
     def close(self, uuid: UUID) -> bool:
@@ -178,16 +251,12 @@ class SharktopodaClient(LogMixin):
         Returns:
             True if the operation was successful, False otherwise.
         """
-        close_command = {"command": "close", "uuid": str(uuid)}
-        close_response = self._request(close_command)
-
-        # Check the response status
-        if close_response["status"] != "ok":
-            cause = close_response.get("cause", None)
-            self.logger.error(f"Failed to close video: {cause}")
+        close_command = {"command": "close", "uuid": _uuid_str(uuid)}
+        close_response = self._request_ok(close_command, "close video")
+        if close_response is None:
             return False
 
-        self.logger.info(f"Closed video {uuid}")
+        self.logger.info("Closed video %s", uuid)
         return True
 
     def show(self, uuid: UUID) -> bool:
@@ -200,16 +269,12 @@ class SharktopodaClient(LogMixin):
         Returns:
             True if the operation was successful, False otherwise.
         """
-        show_command = {"command": "show", "uuid": str(uuid)}
-        show_response = self._request(show_command)
-
-        # Check the response status
-        if show_response["status"] != "ok":
-            cause = show_response.get("cause", None)
-            self.logger.error(f"Failed to show video: {cause}")
+        show_command = {"command": "show", "uuid": _uuid_str(uuid)}
+        show_response = self._request_ok(show_command, "show video")
+        if show_response is None:
             return False
 
-        self.logger.info(f"Showed video {uuid}")
+        self.logger.info("Showed video %s", uuid)
         return True
 
     def request_information(self) -> Optional[VideoInfo]:
@@ -220,12 +285,10 @@ class SharktopodaClient(LogMixin):
             The video information, or None if there is no video.
         """
         request_information_command = {"command": "request information"}
-        request_information_response = self._request(request_information_command)
-
-        # Check the response status
-        if request_information_response["status"] != "ok":
-            cause = request_information_response.get("cause", None)
-            self.logger.error(f"Failed to request video information: {cause}")
+        request_information_response = self._request_ok(
+            request_information_command, "request video information"
+        )
+        if request_information_response is None:
             return None
 
         return VideoInfo.decode(request_information_response)
@@ -238,14 +301,10 @@ class SharktopodaClient(LogMixin):
             The video information, or None if there is no video.
         """
         request_all_information_command = {"command": "request all information"}
-        request_all_information_response = self._request(
-            request_all_information_command
+        request_all_information_response = self._request_ok(
+            request_all_information_command, "request video information"
         )
-
-        # Check the response status
-        if request_all_information_response["status"] != "ok":
-            cause = request_all_information_response.get("cause", None)
-            self.logger.error(f"Failed to request video information: {cause}")
+        if request_all_information_response is None:
             return None
 
         return list(
@@ -263,16 +322,12 @@ class SharktopodaClient(LogMixin):
         Returns:
             True if the operation was successful, False otherwise.
         """
-        play_command = {"command": "play", "uuid": str(uuid), "rate": rate}
-        play_response = self._request(play_command)
-
-        # Check the response status
-        if play_response["status"] != "ok":
-            cause = play_response.get("cause", None)
-            self.logger.error(f"Failed to play video: {cause}")
+        play_command = {"command": "play", "uuid": _uuid_str(uuid), "rate": rate}
+        play_response = self._request_ok(play_command, "play video")
+        if play_response is None:
             return False
 
-        self.logger.info(f"Played video {uuid} at {rate:.2f}x")
+        self.logger.info("Played video %s at %.2fx", uuid, rate)
         return True
 
     def pause(self, uuid: UUID) -> bool:
@@ -285,16 +340,12 @@ class SharktopodaClient(LogMixin):
         Returns:
             True if the operation was successful, False otherwise.
         """
-        pause_command = {"command": "pause", "uuid": str(uuid)}
-        pause_response = self._request(pause_command)
-
-        # Check the response status
-        if pause_response["status"] != "ok":
-            cause = pause_response.get("cause", None)
-            self.logger.error(f"Failed to pause video: {cause}")
+        pause_command = {"command": "pause", "uuid": _uuid_str(uuid)}
+        pause_response = self._request_ok(pause_command, "pause video")
+        if pause_response is None:
             return False
 
-        self.logger.info(f"Paused video {uuid}")
+        self.logger.info("Paused video %s", uuid)
         return True
 
     def request_elapsed_time(self, uuid: UUID) -> Optional[float]:
@@ -306,14 +357,12 @@ class SharktopodaClient(LogMixin):
         """
         request_elapsed_time_command = {
             "command": "request elapsed time",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
         }
-        request_elapsed_time_response = self._request(request_elapsed_time_command)
-
-        # Check the response status
-        if request_elapsed_time_response["status"] != "ok":
-            cause = request_elapsed_time_response.get("cause", None)
-            self.logger.error(f"Failed to request elapsed time: {cause}")
+        request_elapsed_time_response = self._request_ok(
+            request_elapsed_time_command, "request elapsed time"
+        )
+        if request_elapsed_time_response is None:
             return None
 
         return request_elapsed_time_response["elapsed time"]
@@ -327,14 +376,12 @@ class SharktopodaClient(LogMixin):
         """
         request_player_state_command = {
             "command": "request player state",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
         }
-        request_player_state_response = self._request(request_player_state_command)
-
-        # Check the response status
-        if request_player_state_response["status"] != "ok":
-            cause = request_player_state_response.get("cause", None)
-            self.logger.error(f"Failed to request player state: {cause}")
+        request_player_state_response = self._request_ok(
+            request_player_state_command, "request player state"
+        )
+        if request_player_state_response is None:
             return None
 
         return VideoPlayerState.decode(request_player_state_response)
@@ -352,18 +399,16 @@ class SharktopodaClient(LogMixin):
         """
         seek_elapsed_time_command = {
             "command": "seek elapsed time",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
             "elapsedTimeMillis": elapsed_time_millis,
         }
-        seek_elapsed_time_response = self._request(seek_elapsed_time_command)
-
-        # Check the response status
-        if seek_elapsed_time_response["status"] != "ok":
-            cause = seek_elapsed_time_response.get("cause", None)
-            self.logger.error(f"Failed to seek elapsed time: {cause}")
+        seek_elapsed_time_response = self._request_ok(
+            seek_elapsed_time_command, "seek elapsed time"
+        )
+        if seek_elapsed_time_response is None:
             return False
 
-        self.logger.info(f"Seeked video {uuid} to {elapsed_time_millis} ms")
+        self.logger.info("Seeked video %s to %d ms", uuid, elapsed_time_millis)
         return True
 
     def frame_advance(self, uuid: UUID, direction: int) -> bool:
@@ -379,19 +424,15 @@ class SharktopodaClient(LogMixin):
         """
         frame_advance_command = {
             "command": "frame advance",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
             "direction": direction,
         }
-        frame_advance_response = self._request(frame_advance_command)
-
-        # Check the response status
-        if frame_advance_response["status"] != "ok":
-            cause = frame_advance_response.get("cause", None)
-            self.logger.error(f"Failed to advance frame: {cause}")
+        frame_advance_response = self._request_ok(frame_advance_command, "advance frame")
+        if frame_advance_response is None:
             return False
 
         self.logger.info(
-            f"Advanced frame of video {uuid} {'forward' if direction > 0 else 'backward'}"
+            "Advanced frame of video %s %s", uuid, "forward" if direction > 0 else "backward"
         )
         return True
 
@@ -411,16 +452,12 @@ class SharktopodaClient(LogMixin):
         """
         frame_capture_command = {
             "command": "frame capture",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
             "imageLocation": str(image_location),
             "imageReferenceUuid": str(image_reference_uuid),
         }
-        frame_capture_response = self._request(frame_capture_command)
-
-        # Check the response status
-        if frame_capture_response["status"] != "ok":
-            cause = frame_capture_response.get("cause", None)
-            self.logger.error(f"Failed to initiate frame capture: {cause}")
+        frame_capture_response = self._request_ok(frame_capture_command, "initiate frame capture")
+        if frame_capture_response is None:
             return False
 
         return True
@@ -438,20 +475,18 @@ class SharktopodaClient(LogMixin):
         """
         add_localizations_command = {
             "command": "add localizations",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
             "localizations": list(map(Localization.encode, localizations)),
         }
-        add_localizations_response = self._request(add_localizations_command)
-
-        # Check the response status
-        if add_localizations_response["status"] != "ok":
-            cause = add_localizations_response.get("cause", None)
-            self.logger.error(f"Failed to add localizations: {cause}")
+        add_localizations_response = self._request_ok(
+            add_localizations_command, "add localizations"
+        )
+        if add_localizations_response is None:
             return False
 
         self._localization_controller.add_update_localizations(uuid, localizations)
         
-        self.logger.info(f"Added {len(localizations)} localizations to video {uuid}")
+        self.logger.info("Added %d localizations to video %s", len(localizations), uuid)
         return True
 
     def remove_localizations(self, uuid: UUID, localization_uuids: List[UUID]) -> bool:
@@ -467,21 +502,19 @@ class SharktopodaClient(LogMixin):
         """
         remove_localizations_command = {
             "command": "remove localizations",
-            "uuid": str(uuid),
-            "localizations": list(map(str, localization_uuids)),
+            "uuid": _uuid_str(uuid),
+            "localizations": list(map(_uuid_str, localization_uuids)),
         }
-        remove_localizations_response = self._request(remove_localizations_command)
-
-        # Check the response status
-        if remove_localizations_response["status"] != "ok":
-            cause = remove_localizations_response.get("cause", None)
-            self.logger.error(f"Failed to remove localizations: {cause}")
+        remove_localizations_response = self._request_ok(
+            remove_localizations_command, "remove localizations"
+        )
+        if remove_localizations_response is None:
             return False
 
         self._localization_controller.remove_localizations(uuid, localization_uuids)
         
         self.logger.info(
-            f"Removed {len(localization_uuids)} localizations from video {uuid}"
+            "Removed %d localizations from video %s", len(localization_uuids), uuid
         )
         return True
 
@@ -498,20 +531,18 @@ class SharktopodaClient(LogMixin):
         """
         update_localizations_command = {
             "command": "update localizations",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
             "localizations": list(map(Localization.encode, localizations)),
         }
-        update_localizations_response = self._request(update_localizations_command)
-
-        # Check the response status
-        if update_localizations_response["status"] != "ok":
-            cause = update_localizations_response.get("cause", None)
-            self.logger.error(f"Failed to update localizations: {cause}")
+        update_localizations_response = self._request_ok(
+            update_localizations_command, "update localizations"
+        )
+        if update_localizations_response is None:
             return False
         
         self._localization_controller.add_update_localizations(uuid, localizations)
 
-        self.logger.info(f"Updated {len(localizations)} localizations of video {uuid}")
+        self.logger.info("Updated %d localizations of video %s", len(localizations), uuid)
         return True
 
     def clear_localizations(self, uuid: UUID) -> bool:
@@ -526,19 +557,17 @@ class SharktopodaClient(LogMixin):
         """
         clear_localizations_command = {
             "command": "clear localizations",
-            "uuid": str(uuid),
+            "uuid": _uuid_str(uuid),
         }
-        clear_localizations_response = self._request(clear_localizations_command)
-
-        # Check the response status
-        if clear_localizations_response["status"] != "ok":
-            cause = clear_localizations_response.get("cause", None)
-            self.logger.error(f"Failed to clear localizations: {cause}")
+        clear_localizations_response = self._request_ok(
+            clear_localizations_command, "clear localizations"
+        )
+        if clear_localizations_response is None:
             return False
         
         self._localization_controller.clear_collection(uuid)
 
-        self.logger.info(f"Cleared localizations of video {uuid}")
+        self.logger.info("Cleared localizations of video %s", uuid)
         return True
 
     def select_localizations(self, uuid: UUID, localization_uuids: List[UUID]) -> bool:
@@ -554,20 +583,19 @@ class SharktopodaClient(LogMixin):
         """
         select_localizations_command = {
             "command": "select localizations",
-            "uuid": str(uuid),
-            "localizations": list(map(str, localization_uuids)),
+            "uuid": _uuid_str(uuid),
+            "localizations": list(map(_uuid_str, localization_uuids)),
         }
-        select_localizations_response = self._request(select_localizations_command)
-
-        # Check the response status
-        if select_localizations_response["status"] != "ok":
-            self.logger.error(f"Failed to select localizations")
+        select_localizations_response = self._request_ok(
+            select_localizations_command, "select localizations"
+        )
+        if select_localizations_response is None:
             return False
         
-        self._localization_controller.clear_collection(uuid)
+        self._localization_controller.select_localizations(uuid, localization_uuids)
 
         self.logger.info(
-            f"Selected {len(localization_uuids)} localizations of video {uuid}"
+            "Selected %d localizations of video %s", len(localization_uuids), uuid
         )
         return True
 
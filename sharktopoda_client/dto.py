@@ -3,18 +3,38 @@ Sharktopoda 2 data transfer objects.
 """
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from enum import Enum
 from pathlib import Path
 from typing import Optional
 from uuid import UUID
 
 
+def _slotted(cls):
+    """
+    Rebuild a dataclass with __slots__ for its fields, dropping the per-instance __dict__. Equivalent to @dataclass(slots=True, weakref_slot=True), which requires Python 3.11.
+
+    Apply above @dataclass.
+    """
+    field_names = tuple(field.name for field in fields(cls))
+
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names + ("__weakref__",)  # keep instances weak-referenceable
+    for field_name in field_names:
+        cls_dict.pop(field_name, None)  # class-level defaults would conflict with the slots; __init__ keeps them
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
 class Serializable(ABC):
     """
     Serializable interface. Supports encoding and decoding to and from a dictionary.
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def encode(self) -> dict:
         raise NotImplementedError
@@ -25,6 +45,7 @@ class Serializable(ABC):
         raise NotImplementedError
 
 
+@_slotted
 @dataclass
 class VideoPlayerState(Serializable):
     class PlayStatus(str, Enum):
@@ -47,6 +68,7 @@ class VideoPlayerState(Serializable):
         )
 
 
+@_slotted
 @dataclass
 class VideoInfo(Serializable):
 
@@ -76,6 +98,7 @@ class VideoInfo(Serializable):
         )
 
 
+@_slotted
 @dataclass
 class FrameCapture(Serializable):
 
@@ -102,6 +125,7 @@ class FrameCapture(Serializable):
         )
 
 
+@_slotted
 @dataclass
 class Localization(Serializable):
 
@@ -3,19 +3,30 @@ Logging utilities.
 """
 
 import logging
+from typing import Optional
 
+# Package logger. Every library logger is a child of it, so applications can configure them all at once.
+_package_logger = logging.getLogger(__name__.rpartition(".")[0])
+_package_logger.addHandler(logging.NullHandler())  # Ensure no errors if no handlers are configured
+if _package_logger.level == logging.NOTSET:  # don't override application configuration
+    _package_logger.setLevel(logging.INFO)
 
-def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
+
+def get_logger(name: str, level: Optional[int] = None) -> logging.Logger:
     """
-    Get a pre-configured logger with a given name.
+    Get a logger with a given name. Loggers are shared through the logging hierarchy, so they should be named under the package.
 
     Args:
         name: The name of the logger.
+        level: The level to set, if any. By default the level is inherited from the package logger.
 
     Returns:
         A logger with a given name.
     """
-    logger = logging.Logger(name, level=level)
+    logger = logging.getLogger(name)
+
+    if level is not None:
+        logger.setLevel(level)
 
     return logger
 
@@ -34,6 +45,5 @@ class LogMixin:
             The logger for a class.
         """
         if getattr(self, "_logger", None) is None:  # lazy instantiation
-            self._logger = get_logger(self.__class__.__name__)
-            self._logger.addHandler(logging.NullHandler())  # Ensure no errors if no handlers are configured
+            self._logger = get_logger(f"{type(self).__module__}.{type(self).__qualname__}")
         return self._logger
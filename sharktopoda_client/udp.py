@@ -1,9 +1,27 @@
-import json
-from socket import AF_INET, AF_INET6, SOCK_DGRAM, socket, timeout
-from threading import Thread
+from socket import (AF_INET, AF_INET6, SO_RCVBUF, SO_SNDBUF, SOCK_DGRAM,
+                    SOL_SOCKET, socket, timeout)
+from threading import Lock, Thread
 
 from sharktopoda_client.log import LogMixin
 
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to the standard library
+    import json
+
+    # Built once, not per datagram. Compact separators and raw UTF-8 match the orjson output.
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    _decoder = json.JSONDecoder()
+
+    def _dumps(data: dict) -> bytes:
+        return _encoder.encode(data).encode("utf-8")
+
+    def _loads(data: bytes) -> dict:
+        return _decoder.decode(str(data, "utf-8"))
+
 
 class Timeout(Exception):
     """
@@ -37,11 +55,17 @@ class UDPServer(LogMixin):
     IPv6 UDP server.
     """
 
-    def __init__(self, port: int, handler: callable) -> None:
+    def __init__(self, port: int, handler: callable, socket_buffer_size: int = 1 << 20) -> None:
         self._port = port
         self._handler = handler
+        self._socket_buffer_size = socket_buffer_size  # kernel send/receive buffer size, absorbs localization bursts
+
+        # Receive buffer, reused for every datagram. Sized to the largest possible UDP payload.
+        self._receive_buffer = bytearray(65535)
+        self._receive_view = memoryview(self._receive_buffer)
 
         self._socket = None
+        self._socket_lock = Lock()
         self._thread = None
         self._ok = True
 
@@ -65,23 +89,27 @@ class UDPServer(LogMixin):
         """
         self.logger.info("UDP server thread started")
 
+        sock = self.socket  # resolve the lazy property once, not per datagram
+
         while self._ok:
             # Receive
             try:
-                request_bytes, addr = self.socket.recvfrom(4096)
+                n_bytes, addr = sock.recvfrom_into(self._receive_buffer)
             except timeout:
                 continue
-            self.logger.debug("Received UDP datagram {data} from {addr}")
+
+            if not n_bytes:  # empty wake-up datagram, see stop()
+                continue
 
             # Decode
-            request_json = request_bytes.decode("utf-8")
-            request_data = json.loads(request_json)
+            request_data = _loads(self._receive_view[:n_bytes])
+            self.logger.debug("Received UDP datagram %s from %s", request_data, addr)
 
             # Handle
             try:
                 response_data = self._handler(request_data, addr)
             except Exception as e:
-                self.logger.error(f"Error while handling UDP request: {e}")
+                self.logger.error("Error while handling UDP request: %s", e)
                 self._ok = False
                 break
 
@@ -89,11 +117,10 @@ class UDPServer(LogMixin):
                 continue
 
             # Encode
-            response_json = json.dumps(response_data)
-            response_bytes = response_json.encode("utf-8")
+            response_bytes = _dumps(response_data)
 
             # Send
-            self.socket.sendto(response_bytes, addr)
+            sock.sendto(response_bytes, addr)
 
         self.logger.info("UDP server thread exiting")
 
@@ -113,33 +140,50 @@ class UDPServer(LogMixin):
         
         # Wait for thread to exit
         if self._thread is not None:
+            self._wake()
             self.logger.debug("Waiting for UDP server thread to exit")
             self._thread.join()
         
         # Close socket
         self._close()
 
+    def _wake(self) -> None:
+        """
+        Wake the server thread from a blocked receive with an empty datagram, so it exits without waiting out the socket timeout.
+        """
+        try:
+            with EphemeralSocket(ipv6=True) as sock:
+                sock.sendto(b"", ("::1", self._port))
+        except OSError:  # e.g. no IPv6 loopback; the thread still exits on the next timeout
+            pass
+
     @property
     def socket(self):
         """
-        The UDP socket. Lazy-initialized.
+        The UDP socket. Lazy-initialized; thread-safe, so only one socket is ever bound.
         """
         if self._socket is None:
-            self._socket = socket(AF_INET6, SOCK_DGRAM)
-            host = ""  # listen on all interfaces
-            self._socket.bind((host, self._port))
-            self._socket.settimeout(1.0)
-            self.logger.debug(f"Opened UDP socket on {host}:{self._port}")
+            with self._socket_lock:
+                if self._socket is None:  # another thread may have opened it while we waited
+                    sock = socket(AF_INET6, SOCK_DGRAM)
+                    sock.setsockopt(SOL_SOCKET, SO_RCVBUF, self._socket_buffer_size)
+                    sock.setsockopt(SOL_SOCKET, SO_SNDBUF, self._socket_buffer_size)
+                    host = ""  # listen on all interfaces
+                    sock.bind((host, self._port))
+                    sock.settimeout(1.0)
+                    self._socket = sock  # publish only once fully configured
+                    self.logger.debug("Opened UDP socket on %s:%d", host, self._port)
         return self._socket
 
     def _close(self) -> None:
         """
         Close the UDP socket if it is open, and set it to None.
         """
-        if self._socket is not None:
-            self._socket.close()
-            self._socket = None
-            self.logger.debug("Closed UDP socket")
+        with self._socket_lock:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+                self.logger.debug("Closed UDP socket")
 
     def __del__(self):
         self._close()
@@ -151,7 +195,7 @@ class UDPClient(LogMixin):
     """
 
     def __init__(
-        self, server_host: str, server_port: int, buffer_size: int = 4096, timeout: float = 1.0
+        self, server_host: str, server_port: int, buffer_size: int = 65535, timeout: float = 1.0
     ) -> None:
         self._server_host = server_host
         self._server_port = server_port
@@ -177,26 +221,29 @@ class UDPClient(LogMixin):
             dict: Response data.
         """
         # Encode
-        data_json = json.dumps(data)
-        data_bytes = data_json.encode("utf-8")
+        data_bytes = _dumps(data)
 
         with EphemeralSocket(timeout=self._timeout, ipv6=self._ipv6) as sock:
+            # Connect, so the kernel resolves the route once and drops datagrams from other peers
+            sock.connect((self._server_host, self._server_port))
+
             # Send
-            sock.sendto(data_bytes, (self._server_host, self._server_port))
+            sock.send(data_bytes)
             self.logger.debug(
-                f"Sent UDP datagram {data} to {self._server_host}:{self._server_port}"
+                "Sent UDP datagram %s to %s:%d", data, self._server_host, self._server_port
             )
 
             # Receive
             try:
-                response_data_bytes, addr = sock.recvfrom(self._buffer_size)
-                self.logger.debug(f"Received UDP datagram {data} from {addr}")
+                response_data_bytes = sock.recv(self._buffer_size)
             except timeout:
-                self.logger.warning(f"UDP receive timed out")
+                self.logger.warning("UDP receive timed out")
                 raise Timeout()
 
         # Decode
-        response_data_json = response_data_bytes.decode("utf-8")
-        response_data_dict = json.loads(response_data_json)
+        response_data_dict = _loads(response_data_bytes)
+        self.logger.debug(
+            "Received UDP datagram %s from %s:%d", response_data_dict, self._server_host, self._server_port
+        )
 
         return response_data_dict